@@ -1,163 +1,189 @@
 import logging
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+from itertools import chain
+from collections import Counter
 from utils import get_last_working_day_df
 
+try:
+    import polars as pl
+except ImportError:  # Polars is optional, pandas does the aggregation without it
+    pl = None
 
-def compare_with_last_working_day(proj_dir, today_stats_df):
+
+def get_count_deltas(frames, prev_frames, objects, prev_objects):
+    """
+    Computes the change in annotation counts on raw int64 arrays.
+
+    Returns:
+        A tuple (changed_mask, frames_delta, objects_delta) of NumPy arrays.
+    """
+    frames_delta = np.subtract(frames, prev_frames)
+    objects_delta = np.subtract(objects, prev_objects)
+    changed_mask = (frames_delta != 0) | (objects_delta != 0)
+    return changed_mask, frames_delta, objects_delta
+
+def compare_with_last_working_day(proj_dir, today_stats_df, stamp=None):
     """
     Compares the current day's stats with the last working day's stats.
 
     Args:
         proj_dir (str): The parent directory containing date-stamped subfolders.
         today_stats_df (pd.DataFrame): The DataFrame of today's annotation stats.
+        stamp (RunStamp): The run's timestamp, used to tell today's folder apart. If None, the current time is used.
 
     Returns:
         A tuple of two DataFrames: (new_tasks_df, changed_tasks_df).
         Returns (None, None) if a previous file cannot be found.
     """
 
-    last_working_day_df = get_last_working_day_df(proj_dir)
+    last_working_day_df = get_last_working_day_df(proj_dir, stamp)
     if last_working_day_df is None:
         return None, None
 
-    #Prepare DataFrames by temporarily setting 'task_id' as the index ---
-    current_df_indexed = today_stats_df.set_index('task_id')
-    last_day_df_indexed = last_working_day_df.set_index('task_id')
-
-    current_ids = current_df_indexed.index
-    last_day_ids = last_day_df_indexed.index
+    # Join the previous counts onto today's rows in a single pass ---
+    count_columns = ['frames_annotated', 'total_obj_annotated']
+    merged = today_stats_df.merge(last_working_day_df[['task_id'] + count_columns],
+                                  on='task_id', how='left', suffixes=('', '_prev'), indicator=True)
 
     # Filter for NEW tasks
-    new_task_ids = current_ids.difference(last_day_ids)
-    new_tasks_df = current_df_indexed.loc[new_task_ids]
+    new_mask = merged['_merge'] == 'left_only'
+    new_tasks_df = merged.loc[new_mask, today_stats_df.columns].sort_values('task_id', ignore_index=True)
 
     # --- Filter for CHANGED tasks ---
-    common_task_ids = current_ids.intersection(last_day_ids)
-    # Align both dataframes to only common tasks
-    current_common = current_df_indexed.loc[common_task_ids]
-    last_day_common = last_day_df_indexed.loc[common_task_ids]
-
-    # Find rows where the annotation counts have changed
-    changed_mask = (current_common['frames_annotated'] != last_day_common['frames_annotated']) | \
-                   (current_common['total_obj_annotated'] != last_day_common['total_obj_annotated'])
-
-    changed_tasks_df = current_common[changed_mask].copy()
+    # Only tasks present on both days have previous counts, so their columns hold no NaNs
+    common_df = merged[~new_mask]
+    changed_mask, frames_delta, objects_delta = get_count_deltas(
+        common_df['frames_annotated'].to_numpy(dtype='int64'),
+        common_df['frames_annotated_prev'].to_numpy(dtype='int64'),
+        common_df['total_obj_annotated'].to_numpy(dtype='int64'),
+        common_df['total_obj_annotated_prev'].to_numpy(dtype='int64'),
+    )
+    changed_tasks_df = common_df.loc[changed_mask, today_stats_df.columns].reset_index(drop=True)
 
     if not changed_tasks_df.empty:
-        # Calculate the amount of change (delta)
-        frames_delta = current_common['frames_annotated'] - last_day_common['frames_annotated']
-        objects_delta = current_common['total_obj_annotated'] - last_day_common['total_obj_annotated']
-
         # Add the change columns to the changed_tasks_df
         changed_tasks_df['frames_added'] = frames_delta[changed_mask]
         changed_tasks_df['obj_added'] = objects_delta[changed_mask]
 
-    # Reset the index to turn 'task_id' back into a column.
-    new_tasks_df = new_tasks_df.reset_index()
-    changed_tasks_df = changed_tasks_df.reset_index()
     return new_tasks_df, changed_tasks_df
 
 def get_task_stats_in_project(all_tasks_info):
     #Assuming - each task has only one job
 
-    project_stats = {}
-
+    rows = []
     for task_id, task_data in all_tasks_info.items():
-        task_assignee = task_data['task_assignee']
-
-        # Since each task has only one job, we can directly access it
-        jobs_dict = task_data['jobs']
-        job_id = list(jobs_dict.keys())[0]
-        job_assignee = jobs_dict[job_id]['assignee']
-        frame_count = jobs_dict[job_id]['frame_count']
-
-        final_assignee = None
-
-        # --- Assignee Resolution Logic ---
-
-        # 1. Skip if there is a direct conflict
-        if task_assignee != 'Unassigned' and job_assignee != 'Unassigned' and task_assignee != job_assignee:
-            logging.warning(
-                f"⚠️ Skipping Task ID {task_id}: Mismatch -> Task assignee '{task_assignee}' vs Job assignee '{job_assignee}'.")
+        # Tasks without data uploaded yet have no jobs
+        if not task_data['jobs']:
+            logging.warning(f"⚠️ Skipping Task ID {task_id}: it has no jobs.")
             continue
-
-        # 2. If one is 'Unassigned', use the other
-        if task_assignee != 'Unassigned':
-            final_assignee = task_assignee
-        elif job_assignee != 'Unassigned':
-            final_assignee = job_assignee
-        # 3. If both are 'Unassigned', final_assignee remains None (as initialized)
-
-        # Add the cleaned data to the results
-        project_stats[task_id] = {
-            'task_name': task_data['task_name'],
-            'job_id': int(job_id),  # Convert job_id to integer for consistency
-            'frame_count': frame_count,
-            'assignee': final_assignee
-        }
+        # Since each task has only one job, we can directly access it
+        job_id, job_data = next(iter(task_data['jobs'].items()))
+        rows.append((task_id, task_data['task_name'], task_data['task_assignee'],
+                     job_id, job_data['assignee'], job_data['frame_count']))
+
+    tasks_df = pd.DataFrame(rows, columns=['task_id', 'task_name', 'task_assignee',
+                                           'job_id', 'job_assignee', 'frame_count'])
+
+    task_assignee = tasks_df['task_assignee']
+    job_assignee = tasks_df['job_assignee']
+
+    # --- Assignee Resolution Logic ---
+
+    # 1. Skip if there is a direct conflict
+    conflict = (task_assignee != 'Unassigned') & (job_assignee != 'Unassigned') & (task_assignee != job_assignee)
+    for row in tasks_df[conflict].itertuples():
+        logging.warning(
+            f"⚠️ Skipping Task ID {row.task_id}: Mismatch -> Task assignee '{row.task_assignee}' vs Job assignee '{row.job_assignee}'.")
+    tasks_df = tasks_df[~conflict]
+
+    # 2. If one is 'Unassigned', use the other
+    # 3. If both are 'Unassigned', the assignee is None
+    task_assignee = tasks_df['task_assignee'].to_numpy()
+    job_assignee = tasks_df['job_assignee'].to_numpy()
+    final_assignee = np.where(task_assignee != 'Unassigned', task_assignee,
+                              np.where(job_assignee != 'Unassigned', job_assignee, None))
+
+    # Keep the cleaned data, indexed by task_id
+    project_stats = pd.DataFrame({
+        'task_name': tasks_df['task_name'].to_numpy(),
+        'job_id': tasks_df['job_id'].astype('int64').to_numpy(),  # Convert job_id to integer for consistency
+        'frame_count': tasks_df['frame_count'].to_numpy(),
+        'assignee': final_assignee,
+    }, index=pd.Index(tasks_df['task_id'].astype('int64'), name='task_id'))
 
     return project_stats
 
-def get_annotation_stats(project_stats, labels_per_task):
-    data_for_df = []
+def count_annotations_per_task(records):
+    """
+    Aggregates (task_id, frame, label) records into per-task annotation counts.
 
-    for task_id_str, stats in project_stats.items():
-        task_id = int(task_id_str)
+    Uses Polars' multi-threaded group_by when it is installed, and pandas otherwise.
 
-        # Use .get() to safely handle cases where a task has no annotations
-        task_annotations = labels_per_task.get(task_id, {})
+    Args:
+        records (list): One (task_id, frame, label) tuple per annotated shape.
 
-        number_of_frames_annotated = len(task_annotations)
-        if number_of_frames_annotated == 0:
-            continue
+    Returns:
+        A pandas DataFrame with columns task_id, frames_annotated,
+        unique_obj_annotated and total_obj_annotated, sorted by task_id.
+    """
+    # A label counts once per frame, however many shapes of it the frame has
+    if pl is not None:
+        counts = (
+            pl.DataFrame(records, schema=['task_id', 'frame', 'label'], orient='row')
+            .lazy()
+            .unique()
+            .group_by('task_id')
+            .agg(
+                pl.col('frame').n_unique().alias('frames_annotated'),
+                pl.col('label').n_unique().alias('unique_obj_annotated'),
+                pl.len().alias('total_obj_annotated'),
+            )
+            .sort('task_id')
+            .collect()
+        )
+        # Convert to pandas at the boundary, the rest of the report is built with pandas
+        return pd.DataFrame(counts.to_dict(as_series=False))
+
+    annotations_df = pd.DataFrame(records, columns=['task_id', 'frame', 'label']).drop_duplicates()
+    return annotations_df.groupby('task_id', as_index=False).agg(
+        frames_annotated=('frame', 'nunique'),
+        unique_obj_annotated=('label', 'nunique'),
+        total_obj_annotated=('label', 'size'),
+    )
 
-        unique_objects = set()
-        total_objects_annotated = 0
-        for frame_labels in task_annotations.values():
-            unique_objects.update(frame_labels)  # .update() adds all items from a list to a set
-            unique_objects_in_frame = set(frame_labels)
-            total_objects_annotated += len(unique_objects_in_frame)
-
-        unique_objects_annotated = len(unique_objects)
-
-        data_for_df.append({
-            'task_id': task_id,
-            'job_id': stats['job_id'],
-            'task_name': stats['task_name'],
-            'frames': stats['frame_count'],
-            'Assignee': stats['assignee'],
-            'frames_annotated': number_of_frames_annotated,
-            'unique_obj_annotated': unique_objects_annotated,
-            'total_obj_annotated': total_objects_annotated
-        })
-
-    # Create the DataFrame from our list of dictionaries
-    if not data_for_df:
+def get_annotation_stats(project_stats, labels_per_task):
+    # Flatten all annotations into one (task_id, frame, label) row per object
+    records = [(task_id, frame, label)
+               for task_id, task_annotations in labels_per_task.items()
+               for frame, frame_labels in task_annotations.items()
+               for label in frame_labels]
+    if not records:
         # Return an empty DataFrame with correct columns if there's no data
         return pd.DataFrame(columns=[
             'task_id', 'job_id', 'task_name', 'frames', 'Assignee',
             'frames_annotated', 'unique_obj_annotated', 'total_obj_annotated'
         ])
 
-    df = pd.DataFrame(data_for_df)
+    counts_df = count_annotations_per_task(records)
+
+    stats_df = project_stats.reset_index().rename(columns={'frame_count': 'frames', 'assignee': 'Assignee'})
+    stats_df = stats_df[['task_id', 'job_id', 'task_name', 'frames', 'Assignee']]
+
+    # The inner join drops tasks that have no annotations, and keeps the task_id order of counts_df
+    df = counts_df.merge(stats_df, on='task_id', how='inner')
+    df = df[['task_id', 'job_id', 'task_name', 'frames', 'Assignee',
+             'frames_annotated', 'unique_obj_annotated', 'total_obj_annotated']]
 
-    # Sort the DataFrame as requested
-    df_sorted = df.sort_values(by=['Assignee', 'task_id'])
+    # Sort the DataFrame as requested, rows are already in task_id order so a stable sort on Assignee is enough
+    df_sorted = df.sort_values(by='Assignee', kind='stable', ignore_index=True)
 
     return df_sorted #.set_index('task_id')
 
 def get_all_label_counts_in_project(labels_per_task, verbose=False):
-    all_label_counts = defaultdict(int)
-
-    # Iterate through the outer dictionary's values (which are the inner dicts)
-    for task_data in labels_per_task.values():
-        # Iterate through the inner dictionary's values (which are the lists of strings)
-        for labels_list in task_data.values():
-            # Iterate through each label in the list
-            for label in labels_list:
-                # Increment the count for that label
-                all_label_counts[label] += 1
+    # Flatten every task's per-frame label lists and count them in one Counter pass
+    all_label_counts = Counter(chain.from_iterable(
+        labels_list for task_data in labels_per_task.values() for labels_list in task_data.values()))
 
     if verbose:
         for label in all_label_counts:
@@ -0,0 +1,30 @@
+import os
+import sys
+import json
+import shutil
+import logging
+
+import yaml
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def convert_config(yaml_path='config.yaml'):
+    """
+    Writes the YAML config as JSON next to it (config.yaml -> config.json), which load_config
+    then reads instead of the YAML file. The JSON file gets the same permissions as the YAML file,
+    as both hold the CVAT and email credentials.
+    """
+    json_path = os.path.splitext(yaml_path)[0] + '.json'
+    with open(yaml_path, 'r') as f:
+        config = yaml.safe_load(f)
+    with open(json_path + '.tmp', 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write('\n')
+    shutil.copymode(yaml_path, json_path + '.tmp')
+    os.replace(json_path + '.tmp', json_path)
+    logging.info(f"✅ Wrote '{json_path}', it is used instead of '{yaml_path}' from now on")
+    return json_path
+
+
+if __name__ == '__main__':
+    convert_config(*sys.argv[1:2])
@@ -1,264 +1,339 @@
 
-import copy
+import math
+import json
 import logging
+import numpy as np
+import pandas as pd
 from pathlib import Path
-from datetime import datetime
-from collections import defaultdict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from cvat_sdk import make_client
 from cvat_sdk.api_client import Configuration, ApiClient, exceptions
 from cvat_sdk.api_client.models import PatchedTaskWriteRequest, PatchedJobWriteRequest
 from cvat_sdk.api_client.exceptions import ServiceException
+from utils import RunStamp, load_labels_cache_manifest, save_labels_cache_manifest, prune_labels_cache, \
+    read_cached_labels, write_cached_labels
+
+try:
+    import ijson
+except ImportError:  # ijson is optional, without it the annotations are parsed in one go
+    ijson = None
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+MAX_WORKERS = 16  # Concurrent requests to the CVAT server
+
 def get_cvat_configuration(proj_config):
     host = proj_config['cvat']['host'] + ':' + proj_config['cvat']['port']
     username = proj_config['cvat']['username']
     password = proj_config['cvat']['password']
     configuration = Configuration(host=host, username=username, password=password, )
+    # One ApiClient is shared by all workers, so its connection pool must fit them
+    configuration.connection_pool_maxsize = 2 * MAX_WORKERS
     return configuration
 
-def get_task_ids_of_project(cvat_config, project_name):
+def fetch_all_pages(list_page, page_size, api_name):
     '''
-    Loops through project's page
+    Fetches page 1 to learn the total count, then fetches the remaining pages concurrently.
 
-    :param cvat_config:
-    :param project_name:
-    :return:
+    :param list_page: API list method with its filters bound, called as list_page(page=..., page_size=...)
+    :param page_size: Number of results per page
+    :param api_name: Name of the API method, used in error messages
+    :return: List of results from all pages, in page order, or None if page 1 could not be fetched
     '''
-    all_task_ids = []
-    page = 1
-    page_size = 100  # A reasonable page size to avoid overwhelming the server
+    try:
+        (first_page, _) = list_page(page=1, page_size=page_size)
+    except exceptions.ApiException as e:
+        logging.error(f"Exception when calling {api_name} on page 1: {e}")
+        return None
+
+    all_results = list(first_page.results or [])
+    total_count = first_page.count or 0
+    # The server may cap the page size below the requested one, so count pages by the rows it actually returned
+    rows_per_page = len(all_results) or page_size
+    n_pages = max(math.ceil(total_count / rows_per_page), 1)
+
+    if n_pages > 1:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            # Futures are kept in page order, so results are extended in page order
+            futures = {page: executor.submit(list_page, page=page, page_size=page_size)
+                       for page in range(2, n_pages + 1)}
+            for page, future in futures.items():
+                try:
+                    (page_data, _) = future.result()
+                except exceptions.ApiException as e:
+                    logging.error(f"Exception when calling {api_name} on page {page}: {e}")
+                    break  # Keep the pages fetched so far, like a sequential walk would
+                all_results.extend(page_data.results or [])
+
+    if len(all_results) < total_count:
+        logging.warning(f"⚠️ {api_name} returned {len(all_results)} of {total_count} results, "
+                        f"the missing ones are not included.")
+    return all_results
+
+def list_all_tasks(api_client, project_name):
+    '''
+    Lists all tasks of the project with a single paginated walk.
 
-    with ApiClient(cvat_config) as api_client:
-        logging.info(f"Fetching all tasks for project '{project_name}'...")
-        while True:
-            try:
-                # Fetch one page of tasks
-                (tasks_page, response) = api_client.tasks_api.list(
-                    project_name=project_name,
-                    page=page,
-                    page_size=page_size,
-                )
-
-                # Add the task IDs from the current page to our master list
-                if tasks_page.results:
-                    for task in tasks_page.results:
-                        all_task_ids.append(task.id)
-                    logging.info(
-                        f"  ... fetched page {page}, found {len(tasks_page.results)} tasks. Total so far: {len(all_task_ids)}")
-
-                # If the 'next' attribute is None, it means we are on the last page
-                if not tasks_page.next:
-                    break  # Exit the loop
-
-                # Otherwise, prepare to fetch the next page
-                page += 1
-
-            except exceptions.ApiException as e:
-                logging.error(f"Exception when calling TasksApi.list() on page {page}: {e}")
-                break  # Exit the loop if an error occurs
-
-    logging.info(f"✅ Finished. Found a total of {len(all_task_ids)} tasks for the project.")
-
-    return all_task_ids
-
-def get_task_ids_to_name(cvat_config, project_name):
-    all_task_ids = {}
-    page = 1
+    get_cvat_data lists the tasks once per run and passes them to the helpers below,
+    so they don't each paginate the same task list.
+
+    :param api_client: ApiClient shared by all CVAT calls
+    :param project_name: Name of the CVAT project
+    :return: List of SDK task objects
+    '''
     page_size = 100  # A reasonable page size to avoid overwhelming the server
 
-    with ApiClient(cvat_config) as api_client:
-        logging.info(f"Fetching all tasks for project '{project_name}'...")
-        while True:
-            try:
-                # Fetch one page of tasks
-                (tasks_page, response) = api_client.tasks_api.list(
-                    project_name=project_name,
-                    page=page,
-                    page_size=page_size,
-                )
-
-                # Add the task IDs from the current page to our master list
-                if tasks_page.results:
-                    for task in tasks_page.results:
-                        all_task_ids[task.id] = task.name
-                    logging.info(
-                        f"  ... fetched page {page}, found {len(tasks_page.results)} tasks. Total so far: {len(all_task_ids)}")
-
-                # If the 'next' attribute is None, it means we are on the last page
-                if not tasks_page.next:
-                    break  # Exit the loop
-
-                # Otherwise, prepare to fetch the next page
-                page += 1
-
-            except exceptions.ApiException as e:
-                logging.error(f"Exception when calling TasksApi.list() on page {page}: {e}")
-                break  # Exit the loop if an error occurs
-
-    logging.info(f"✅ Finished. Found a total of {len(all_task_ids)} tasks for the project.")
+    logging.info(f"Fetching all tasks for project '{project_name}'...")
+    tasks = fetch_all_pages(partial(api_client.tasks_api.list, project_name=project_name),
+                            page_size, 'TasksApi.list()') or []
+
+    logging.info(f"✅ Finished. Found a total of {len(tasks)} tasks for the project.")
 
+    return tasks
+
+def get_task_ids_of_project(api_client, project_name, tasks=None):
+    '''
+    Lists the ids of all tasks in the project
+
+    :param api_client:
+    :param project_name:
+    :param tasks: Tasks already listed by list_all_tasks(). If None, they are listed here
+    :return:
+    '''
+    tasks = list_all_tasks(api_client, project_name) if tasks is None else tasks
+    return [task.id for task in tasks]
+
+def get_task_ids_to_name(api_client, project_name, tasks=None):
     # name_to_task_id_map = {value: key for key, value in task_id_2_name_map.items()}
+    tasks = list_all_tasks(api_client, project_name) if tasks is None else tasks
+    return {task.id: task.name for task in tasks}
 
-    return all_task_ids
+def get_task_updated_dates(api_client, project_name, tasks=None):
+    tasks = list_all_tasks(api_client, project_name) if tasks is None else tasks
+    return {task.id: task.updated_date.isoformat() for task in tasks}
 
-def get_complete_label_mapping(cvat_config, project_id, verbose=False):
+def get_complete_label_mapping(api_client, project_id, verbose=False):
     """Get complete label ID to name mapping from project"""
     logging.info(f"Fetching label_id and name for project...")
-    with ApiClient(cvat_config) as client:
-        try:
-            # Get labels from the project using pagination to get all
-            label_id_to_name = {}
-            page = 1
-            page_size = 500
-
-            while True:
-                labels_list, response = client.labels_api.list(
-                    project_id=project_id,
-                    page=page,
-                    page_size=page_size
-                )
-
-                if hasattr(labels_list, 'results'):
-                    for label in labels_list.results:
-                        label_id_to_name[label.id] = label.name
-                elif isinstance(labels_list, list):
-                    for label in labels_list:
-                        label_id_to_name[label.id] = label.name
-
-                # Check if there are more pages
-                if hasattr(labels_list, 'count') and len(label_id_to_name) >= labels_list.count:
-                    break
-                if not hasattr(labels_list, 'results') or len(labels_list.results) < page_size:
-                    break
-                page += 1
-
-            if verbose:
-                logging.info("Complete label mapping:")
-                for label_id, label_name in sorted(label_id_to_name.items()):
-                    logging.info(f"  Label ID {label_id}: {label_name}")
-
-            return label_id_to_name
-
-        except Exception as e:
-            logging.error(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
-            return {}
-
-def get_labels_per_frame(cvat_config, task_id, label_mapping, verbose=False):
-    logging.info(f"Connecting to CVAT Server to get labels for Task ID {task_id}")
-    with ApiClient(cvat_config) as client:
-        try:
-            # Retrieve annotations
-            annotations, _ = client.tasks_api.retrieve_annotations(id=task_id)
+    try:
+        # Get labels from the project using pagination to get all
+        label_id_to_name = {}
+        page = 1
+        page_size = 500
 
-            # Get labels per frame (only shapes)
-            labels_per_frame = defaultdict(list)
+        while True:
+            labels_list, response = api_client.labels_api.list(
+                project_id=project_id,
+                page=page,
+                page_size=page_size
+            )
+
+            if hasattr(labels_list, 'results'):
+                for label in labels_list.results:
+                    label_id_to_name[label.id] = label.name
+            elif isinstance(labels_list, list):
+                for label in labels_list:
+                    label_id_to_name[label.id] = label.name
+
+            # Check if there are more pages
+            if hasattr(labels_list, 'count') and len(label_id_to_name) >= labels_list.count:
+                break
+            if not hasattr(labels_list, 'results') or len(labels_list.results) < page_size:
+                break
+            page += 1
 
-            if hasattr(annotations, 'shapes') and annotations.shapes:
-                for shape in annotations.shapes:
-                    label_name = label_mapping.get(shape.label_id, f"Unknown_label_{shape.label_id}")
-                    labels_per_frame[shape.frame].append(label_name)
+        if verbose:
+            logging.info("Complete label mapping:")
+            for label_id, label_name in sorted(label_id_to_name.items()):
+                logging.info(f"  Label ID {label_id}: {label_name}")
 
-            # Convert to regular dict and sort
-            result = {frame: labels for frame, labels in sorted(labels_per_frame.items())}
+        return label_id_to_name
 
-            if verbose:
-                logging.info(f"\nLabels per frame for Task {task_id}:")
-                for frame, labels in result.items():
-                    logging.info(f"Frame {frame}: {labels}")
+    except Exception as e:
+        logging.error(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {}
 
-            return result
+def group_labels_by_frame(frames, label_ids, label_mapping):
+    '''
+    Groups the label names of shapes by frame, using a sort and split instead of a per-shape dict append.
 
-        except ServiceException as e:
-            # print(f"Exception object: {e}")     # TEMPORARY DEBUG CODE
-            # print(f"Available attributes: {dir(e)}")
-            logging.error(f"❗️ CVAT Server Error on Task ID {task_id}: Status {e.status}. Skipping this task.")
-            return {}  # Return empty dict to continue the loop
+    :param frames: NumPy array with the frame of each shape
+    :param label_ids: NumPy array with the label_id of each shape
+    :param label_mapping: Dict of label_id -> label name
+    :return: Dict of frame -> list of label names, sorted by frame
+    '''
+    if frames.size == 0:
+        return {}
+
+    # A stable sort keeps the shapes of each frame in their original order
+    order = np.argsort(frames, kind='stable')
+    frames_sorted = frames[order]
+
+    # Resolve each distinct label_id to its name only once
+    unique_label_ids, label_index = np.unique(label_ids[order], return_inverse=True)
+    label_names = np.empty(len(unique_label_ids), dtype=object)
+    for i, label_id in enumerate(unique_label_ids.tolist()):
+        label_name = label_mapping.get(label_id)
+        label_names[i] = label_name if label_name is not None else f"Unknown_label_{label_id}"
+    label_names_sorted = label_names[label_index]
+
+    # Split the sorted labels wherever the frame changes
+    boundaries = np.flatnonzero(np.diff(frames_sorted)) + 1
+    unique_frames = frames_sorted[np.r_[0, boundaries]]
+    return {frame: labels.tolist()
+            for frame, labels in zip(unique_frames.tolist(), np.split(label_names_sorted, boundaries))}
+
+def get_frame_label_ids(api_client, task_id):
+    '''
+    Downloads the (frame, label_id) of every shape of a task.
+
+    :return: NumPy int64 array of shape (n_shapes, 2), or None if the download failed
+    '''
+    logging.info(f"Connecting to CVAT Server to get labels for Task ID {task_id}")
+    try:
+        # Retrieve annotations as a raw stream, skipping the SDK model objects for every shape
+        _, response = api_client.tasks_api.retrieve_annotations(id=task_id, _parse_response=False)
 
-        except Exception as e:
-            # print(f"Error: {e}")
-            logging.error(f"❗️ An unexpected error occurred on Task ID {task_id}: {e}. Skipping this task.")
-            # import traceback
-            # traceback.print_exc()
-            return {}
+        try:
+            if ijson is not None:
+                shapes = ijson.items(response, 'shapes.item')
+            else:
+                shapes = json.loads(response.read()).get('shapes') or []
+            # Read the (frame, label_id) of every shape into one NumPy array
+            return np.fromiter(((shape['frame'], shape['label_id']) for shape in shapes),
+                               dtype=np.dtype((np.int64, 2)))
+        finally:
+            response.release_conn()
+
+    except ServiceException as e:
+        # print(f"Exception object: {e}")     # TEMPORARY DEBUG CODE
+        # print(f"Available attributes: {dir(e)}")
+        logging.error(f"❗️ CVAT Server Error on Task ID {task_id}: Status {e.status}. Skipping this task.")
+        return None  # Return None to continue the loop, and to keep the failure out of the cache
+
+    except Exception as e:
+        # print(f"Error: {e}")
+        logging.error(f"❗️ An unexpected error occurred on Task ID {task_id}: {e}. Skipping this task.")
+        # import traceback
+        # traceback.print_exc()
+        return None
+
+def get_labels_per_frame(api_client, task_id, label_mapping, verbose=False):
+    frame_label_ids = get_frame_label_ids(api_client, task_id)
+    if frame_label_ids is None:
+        return None
+
+    # Get labels per frame (only shapes)
+    result = group_labels_by_frame(frame_label_ids[:, 0], frame_label_ids[:, 1], label_mapping)
+
+    if verbose:
+        logging.info(f"\nLabels per frame for Task {task_id}:")
+        for frame, labels in result.items():
+            logging.info(f"Frame {frame}: {labels}")
+
+    return result
+
+def get_labels_for_all_tasks(api_client, all_task_ids, label_id_to_name, task_ids_to_skip,
+                             cache_dir=None, task_updated_dates=None):
+    '''
+    Gets the labels per frame of every task, downloading only the tasks that changed since they were cached.
 
-def get_labels_for_all_tasks(cvat_config, all_task_ids, label_id_to_name, task_ids_to_skip):
+    :param cache_dir: Directory of the labels cache. If None, every task is downloaded
+    :param task_updated_dates: Dict of task_id -> updated_date, as returned by get_task_updated_dates()
+    :return: Dict of task_id -> {frame: [labels]}
+    '''
+    task_ids = [task_id for task_id in all_task_ids if task_id not in task_ids_to_skip]
+    task_updated_dates = task_updated_dates or {}
     labels_per_task = {}
-    for task_id in all_task_ids:
-        if task_id in task_ids_to_skip:
-            continue
-        labels_per_frame = get_labels_per_frame(cvat_config, task_id, label_id_to_name)
-        labels_per_task[task_id] = copy.deepcopy(labels_per_frame)
+
+    # The cache holds label ids, resolved to names on read, so it needs the label mapping.
+    # Without it (e.g. the mapping fetch failed) the cache is neither read nor written.
+    if cache_dir is not None and not label_id_to_name:
+        logging.warning("⚠️ No label mapping available, not using the labels cache for this run.")
+        cache_dir = None
+
+    # Reuse the cached labels of tasks which have not been updated since they were cached
+    task_ids_to_fetch = task_ids
+    if cache_dir is not None:
+        manifest = load_labels_cache_manifest(cache_dir)
+        task_ids_to_fetch = []
+        for task_id in task_ids:
+            cached_frame_label_ids = None
+            updated_date = task_updated_dates.get(task_id)
+            if updated_date is not None and manifest.get(str(task_id)) == updated_date:
+                cached_frame_label_ids = read_cached_labels(cache_dir, task_id)
+            if cached_frame_label_ids is None:
+                task_ids_to_fetch.append(task_id)
+            else:
+                labels_per_task[task_id] = group_labels_by_frame(
+                    cached_frame_label_ids[:, 0], cached_frame_label_ids[:, 1], label_id_to_name)
+        logging.info(f"Using cached labels for {len(labels_per_task)} unchanged tasks, "
+                     f"downloading {len(task_ids_to_fetch)} tasks.")
+
+    # Each worker downloads the (frame, label_id) of the shapes of one task
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(lambda task_id: get_frame_label_ids(api_client, task_id), task_ids_to_fetch)
+        for task_id, frame_label_ids in zip(task_ids_to_fetch, results):
+            if frame_label_ids is None:
+                labels_per_task[task_id] = {}  # Failed download, not cached so it is retried next run
+                continue
+            labels_per_task[task_id] = group_labels_by_frame(
+                frame_label_ids[:, 0], frame_label_ids[:, 1], label_id_to_name)
+            if cache_dir is not None and task_id in task_updated_dates \
+                    and write_cached_labels(cache_dir, task_id, frame_label_ids):
+                manifest[str(task_id)] = task_updated_dates[task_id]
+
+    if cache_dir is not None:
+        # Forget deleted and skipped tasks. An empty task list more likely means the listing failed,
+        # so the cache is kept as it is then.
+        if task_ids:
+            prune_labels_cache(cache_dir, manifest, task_ids)
+        save_labels_cache_manifest(cache_dir, manifest)
     return labels_per_task
 
-def get_all_task_info_in_project(cvat_config, project_name):
+def get_all_task_info_in_project(api_client, project_name, tasks=None):
     all_tasks_info = {}
-    tasks_page = 1
     page_size = 50
 
-    with ApiClient(cvat_config) as api_client:
-        logging.info(f"Fetching all tasks and their jobs for project '{project_name}'...")
-        while True:
-            try:
-                (tasks_page_data, _) = api_client.tasks_api.list(
-                    project_name=project_name,
-                    page=tasks_page,
-                    page_size=page_size,
-                )
-
-                if not tasks_page_data.results:
-                    break  # No more tasks
-
-                # Process each task found on the page
-                for task in tasks_page_data.results:
-                    logging.info(f"Processing Task {task.id}: '{task.name}'")
-                    task_assignee = task.assignee.username if task.assignee else 'Unassigned'
-
-                    jobs_info = {}
-                    jobs_page = 1
-
-                    # 2. Inner loop to paginate through all JOBS for the current task
-                    while True:
-                        (jobs_page_data, _) = api_client.jobs_api.list(
-                            task_id=task.id,
-                            page=jobs_page,
-                            page_size=page_size
-                        )
-
-                        if not jobs_page_data.results:
-                            break  # No more jobs for this task
-
-                        for job in jobs_page_data.results:
-                            job_assignee = job.assignee.username if job.assignee else 'Unassigned'
-                            frame_count = job.stop_frame - job.start_frame + 1
-                            jobs_info[job.id] = {
-                                'job_name': f"Job #{job.id} ({job.stage})",
-                                'assignee': job_assignee,
-                                'frame_count': frame_count,
-                            }
-
-                        if not jobs_page_data.next:
-                            break  # Last page of jobs for this task
-                        jobs_page += 1
-
-                    # print(f"  --> Found {len(jobs_info)} jobs for this task.")
-
-                    all_tasks_info[task.id] = {
-                        'task_name': task.name,
-                        'task_assignee': task_assignee,
-                        'jobs': jobs_info
-                    }
-
-                if not tasks_page_data.next:
-                    break  # Last page of tasks
-                tasks_page += 1
-
-            except exceptions.ApiException as e:
-                logging.error(f"An API Exception occurred: {e}")
-                break
+    logging.info(f"Fetching all tasks and their jobs for project '{project_name}'...")
+    tasks = list_all_tasks(api_client, project_name) if tasks is None else tasks
+
+    # Fan out the JOBS queries for all tasks at once
+    def list_jobs_of_task(task):
+        return fetch_all_pages(partial(api_client.jobs_api.list, task_id=task.id),
+                               page_size, f'JobsApi.list() for task {task.id}')
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        jobs_per_task = list(executor.map(list_jobs_of_task, tasks))
+
+    # Process each task found in the project
+    for task, jobs in zip(tasks, jobs_per_task):
+        logging.info(f"Processing Task {task.id}: '{task.name}'")
+        if jobs is None:
+            logging.error(f"❗️ Could not fetch the jobs of Task ID {task.id}. Skipping this task.")
+            continue
+        task_assignee = task.assignee.username if task.assignee else 'Unassigned'
+
+        jobs_info = {}
+        for job in jobs:
+            job_assignee = job.assignee.username if job.assignee else 'Unassigned'
+            frame_count = job.stop_frame - job.start_frame + 1
+            jobs_info[job.id] = {
+                'job_name': f"Job #{job.id} ({job.stage})",
+                'assignee': job_assignee,
+                'frame_count': frame_count,
+            }
+
+        # print(f"  --> Found {len(jobs_info)} jobs for this task.")
+
+        all_tasks_info[task.id] = {
+            'task_name': task.name,
+            'task_assignee': task_assignee,
+            'jobs': jobs_info
+        }
 
     logging.info(f"✅ Finished. Compiled data for {len(all_tasks_info)} tasks.")
 
@@ -269,97 +344,127 @@ def get_cvat_data(proj_config):
     project_id = proj_config['cvat']['project_id']
     task_ids_to_skip = proj_config['cvat']['task_ids_to_skip']
 
+    labels_cache_dir = Path(proj_config['proj_dir'], '.cache', 'labels')
+
     cvat_config = get_cvat_configuration(proj_config)
-    label_id_to_name = get_complete_label_mapping(cvat_config, project_id)
-    all_task_ids = get_task_ids_of_project(cvat_config, project_name)
-    labels_per_task = get_labels_for_all_tasks(cvat_config, all_task_ids, label_id_to_name, task_ids_to_skip)
-    all_tasks_info = get_all_task_info_in_project(cvat_config, project_name)
+    # A single long-lived client keeps its connection pool alive across all the calls below
+    with ApiClient(cvat_config) as api_client, ThreadPoolExecutor(max_workers=2) as executor:
+        # The label mapping and the task list are independent, so fetch them concurrently
+        label_mapping_future = executor.submit(get_complete_label_mapping, api_client, project_id)
+        # The task list is walked once for this run and shared with the helpers
+        tasks = list_all_tasks(api_client, project_name)
+        task_updated_dates = get_task_updated_dates(api_client, project_name, tasks)
+        all_task_ids = list(task_updated_dates)
+
+        # The jobs can be fetched while the labels are downloaded
+        all_tasks_info_future = executor.submit(get_all_task_info_in_project, api_client, project_name, tasks)
+        label_id_to_name = label_mapping_future.result()
+        labels_per_task = get_labels_for_all_tasks(api_client, all_task_ids, label_id_to_name, task_ids_to_skip,
+                                                   labels_cache_dir, task_updated_dates)
+        all_tasks_info = all_tasks_info_future.result()
 
     return all_tasks_info, labels_per_task
 
-def get_taskid_2_jobid(cvat_config, project_name):
+def get_taskid_2_jobid(api_client, project_name, tasks=None):
     # Assuming - each task has only one job
     taskid_2_jobid_map = {}
-    tasks_page = 1
     page_size = 50
 
-    with ApiClient(cvat_config) as api_client:
-        logging.info(f"Fetching all tasks and their jobs for project {project_name}...")
-        while True:
-            try:
-                (tasks_page_data, _) = api_client.tasks_api.list(
-                    project_name=project_name,
-                    page=tasks_page,
-                    page_size=page_size, )
-
-                if not tasks_page_data.results:
-                    break  # No more tasks
-
-                # Process each task found on the page
-                for task in tasks_page_data.results:
-                    logging.info(f"Processing Task {task.id}: '{task.name}'")
-                    (jobs_page_data, _) = api_client.jobs_api.list(task_id=task.id, page=1, page_size=page_size)
+    logging.info(f"Fetching all tasks and their jobs for project {project_name}...")
+    tasks = list_all_tasks(api_client, project_name) if tasks is None else tasks
 
-                    if len(jobs_page_data.results) > 1:
-                        logging.error(f'More than 1 job for {task.id = }')
-                        continue
+    def list_first_jobs_page(task):
+        try:
+            (jobs_page_data, _) = api_client.jobs_api.list(task_id=task.id, page=1, page_size=page_size)
+            return jobs_page_data.results
+        except exceptions.ApiException as e:
+            logging.error(f"An API Exception occurred: {e}")
+            return []
 
-                    job = jobs_page_data.results[0]
-                    taskid_2_jobid_map[task.id] = job.id
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        jobs_per_task = list(executor.map(list_first_jobs_page, tasks))
 
-                if not tasks_page_data.next:
-                    break  # Last page of tasks
-                tasks_page += 1
+    # Process each task found in the project
+    for task, jobs in zip(tasks, jobs_per_task):
+        logging.info(f"Processing Task {task.id}: '{task.name}'")
+        if len(jobs) > 1:
+            logging.error(f'More than 1 job for {task.id = }')
+            continue
+        if not jobs:
+            continue
 
-            except exceptions.ApiException as e:
-                logging.error(f"An API Exception occurred: {e}")
-                break
+        job = jobs[0]
+        taskid_2_jobid_map[task.id] = job.id
 
     logging.info(f"✅ Got job_id for {len(taskid_2_jobid_map)} tasks in {project_name} project.")
 
     return taskid_2_jobid_map
 
-def assign_task_to_user(cvat_config_object, task_id, user_id):
+def assign_task_to_user(api_client, task_id, user_id, verbose=False):
     logging.info (f'Assigning {task_id = } to {user_id = }')
-    with ApiClient(cvat_config_object) as client:
-        task, response = client.tasks_api.retrieve(id=task_id)
+    if verbose:
+        # Retrieve the task details (an extra request, only needed for logging)
+        task, response = api_client.tasks_api.retrieve(id=task_id)
         logging.info(f"Found task: {task.name} (ID: {task.id})")
         try:
             if task.assignee:
                 logging.warning(f"Current assignee for task_id {task_id}: {task.assignee['username']}")
         except: pass
-        # Create a request object with only the fields you want to change.
-        update_spec = PatchedTaskWriteRequest(assignee_id=user_id)
-        logging.info('PatchedTaskWriteRequest created')
-        try:
-            # Call the partial_update method.
-            client.tasks_api.partial_update(id=task_id, patched_task_write_request=update_spec)
-            logging.info(f"Assigned task {task_id} to user {user_id}")   # {task.assignee['username']}
-        except exceptions.ApiException as e:
-            logging.error(f"An API error occurred during assignment: {e}")
+    # Create a request object with only the fields you want to change.
+    update_spec = PatchedTaskWriteRequest(assignee_id=user_id)
+    logging.info('PatchedTaskWriteRequest created')
+    try:
+        # Call the partial_update method.
+        api_client.tasks_api.partial_update(id=task_id, patched_task_write_request=update_spec)
+        logging.info(f"Assigned task {task_id} to user {user_id}")   # {task.assignee['username']}
+    except exceptions.ApiException as e:
+        logging.error(f"An API error occurred during assignment: {e}")
 
-def assign_job_to_user(cvat_config_object, job_id, user_id):
-    logging.info (f'Assigning {job_id = } to {user_id = }')
-    with ApiClient(cvat_config_object) as client:
+def assign_tasks_to_users(api_client, task_user_pairs, verbose=False):
+    '''
+    Assigns many tasks at once, running the updates concurrently.
+
+    :param api_client: ApiClient shared by all CVAT calls
+    :param task_user_pairs: List of (task_id, user_id) tuples
+    :param verbose: If True, retrieve and log each task's current assignee first
+    '''
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(lambda pair: assign_task_to_user(api_client, *pair, verbose=verbose),
+                          task_user_pairs))
 
-        # Retrieve the job details (optional, for verification)
-        job, response = client.jobs_api.retrieve(id=job_id)
+def assign_job_to_user(api_client, job_id, user_id, verbose=False):
+    logging.info (f'Assigning {job_id = } to {user_id = }')
+    if verbose:
+        # Retrieve the job details (an extra request, only needed for verification)
+        job, response = api_client.jobs_api.retrieve(id=job_id)
         logging.info(f"Found job ID: {job.id} from (Task ID: {job.task_id})")
         try:
             if job.assignee:
                 logging.warning(f"Current assignee for job_id {job_id}: {job.assignee}")
         except:
             pass
-        # Create a request object to update the assignee
-        update_spec = PatchedJobWriteRequest(assignee=user_id)
-        logging.info('PatchedJobWriteRequest created')
-        try:
-            # Call the partial_update method for the job
-            client.jobs_api.partial_update(id=job_id, patched_job_write_request=update_spec)
+    # Create a request object to update the assignee
+    update_spec = PatchedJobWriteRequest(assignee=user_id)
+    logging.info('PatchedJobWriteRequest created')
+    try:
+        # Call the partial_update method for the job
+        api_client.jobs_api.partial_update(id=job_id, patched_job_write_request=update_spec)
 
-            logging.info(f"Assigned job {job_id} to user {user_id}")
-        except exceptions.ApiException as e:
-            logging.error(f"An API error occurred during job assignment: {e}")
+        logging.info(f"Assigned job {job_id} to user {user_id}")
+    except exceptions.ApiException as e:
+        logging.error(f"An API error occurred during job assignment: {e}")
+
+def assign_jobs_to_users(api_client, job_user_pairs, verbose=False):
+    '''
+    Assigns many jobs at once, running the updates concurrently.
+
+    :param api_client: ApiClient shared by all CVAT calls
+    :param job_user_pairs: List of (job_id, user_id) tuples
+    :param verbose: If True, retrieve and log each job's current assignee first
+    '''
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(lambda pair: assign_job_to_user(api_client, *pair, verbose=verbose),
+                          job_user_pairs))
 
 def download_taskid_annotations(proj_config, task_id, annotations_dir, task_name):
     username      = proj_config['cvat']['username']
@@ -373,7 +478,8 @@ def download_taskid_annotations(proj_config, task_id, annotations_dir, task_name
         filename = Path(task_name).stem
     except: pass
 
-    output_filename = f"{filename}_datumaro_annotations.zip"
+    # The task id keeps the file unique when several tasks share a name stem, as they are downloaded concurrently
+    output_filename = f"{filename}_{task_id}_datumaro_annotations.zip"
     out_path = Path(annotations_dir, output_filename)
     logging.info(f'Downloading annotation file for {task_id = }, {task_name =}')
     try:
@@ -385,20 +491,24 @@ def download_taskid_annotations(proj_config, task_id, annotations_dir, task_name
         logging.error(f'Error in downloading annotation file for {task_id = }, {task_name =}')
     return output_filename
 
-def download_new_tasks_annotations(proj_config, new_tasks_df, changed_tasks_df):
+def download_new_tasks_annotations(proj_config, new_tasks_df, changed_tasks_df, stamp=None):
     annotations_dir = proj_config['annotations_dir']
-    today_str = datetime.now().strftime('%Y%m%d')
+    today_str = (stamp or RunStamp()).ymd
     today_annotations_dir = Path(annotations_dir, today_str)
     today_annotations_dir.mkdir(exist_ok=True)
     today_annotation_filenames = []
 
-    new_tasks = dict(zip(new_tasks_df['task_id'], new_tasks_df['task_name']))
-    changed_tasks = dict(zip(changed_tasks_df['task_id'], changed_tasks_df['task_name']))
-    new_tasks.update(changed_tasks)
-
-    for task_id in new_tasks:
-        task_name = new_tasks[task_id]
-        annotation_filename = download_taskid_annotations(proj_config, task_id, today_annotations_dir, task_name)
-        today_annotation_filenames.append(annotation_filename)
+    tasks_to_download = pd.concat([new_tasks_df[['task_id', 'task_name']], changed_tasks_df[['task_id', 'task_name']]],
+                                  ignore_index=True).drop_duplicates('task_id')
+    # tolist() gives plain Python ints, which the SDK's input validation expects
+    task_ids = tasks_to_download['task_id'].tolist()
+    task_names = tasks_to_download['task_name'].tolist()
+
+    # make_client() is created per call, so the downloads share no client state
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(
+            lambda task_id, task_name: download_taskid_annotations(proj_config, task_id, today_annotations_dir, task_name),
+            task_ids, task_names)
+        today_annotation_filenames.extend(results)
     return today_annotation_filenames
 
@@ -1,42 +1,134 @@
+import io
 import os
-import yaml
+import json
+import shutil
 import logging
-import smtplib
-import pandas as pd
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from html import escape
+from string import Template
+from fnmatch import fnmatchcase
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
-def get_last_working_day_df(directory_path):
-    today_str = datetime.now().strftime('%Y%m%d')
-    # Find the last working day's CSV file ---
-    # Get all subdirectories that are valid dates and are not today
-    date_folders = [d for d in os.listdir(directory_path)
-                    if os.path.isdir(os.path.join(directory_path, d))
-                    and d.isdigit() and len(d) == 8 and d < today_str]
+# pandas, pyarrow, yaml, smtplib and the email modules are imported inside the functions that use them,
+# so importing utils stays cheap for scripts that only need some of its helpers
 
-    if not date_folders:
-        logging.error("💡 No previous working day's folder found. Cannot perform comparison.")
-        return None
+@lru_cache(maxsize=None)
+def import_pyarrow_csv():
+    """
+    Imports pyarrow and its CSV module on first use.
+
+    Returns:
+        A tuple (pyarrow, pyarrow.csv), or (None, None) if pyarrow is not installed,
+        as it is optional for reading the CSV reports and pandas reads them without.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pacsv
+    except ImportError:
+        return None, None
+    return pa, pacsv
+
+# Only the first rows of each table go into the email body, the full tables are attached as gzipped CSVs
+EMAIL_PREVIEW_ROWS = 50
+
+# Matches the CSVs written by save_csv, '{proj_name}_annotation_stats_{YYYYmmdd_HHMM}.csv'
+STATS_CSV_PATTERN = '*_annotation_stats_*.csv'
+
+# The columns the comparison with the last working day reads back from a stats CSV, and their types,
+# so reading it needs no type inference
+ANNOTATION_STATS_USECOLS = ['task_id', 'frames_annotated', 'total_obj_annotated']
+ANNOTATION_STATS_DTYPES = {
+    'task_id': 'int64',
+    'frames_annotated': 'int64',
+    'total_obj_annotated': 'int64',
+}
+
+# The annotation files section is built once at import, so each report only fills in its values
+ANNOTATION_FILES_TEMPLATE = Template("""
+        <h3>${num_new} New annotation files downloaded :</h3>
+        <p> at: ${annotations_dir}/${today_str} </p>
+        <ul>
+            ${file_list_html}
+        </ul>
+        """)
+
+# The email page is split around its sections, which are written in order into one buffer
+EMAIL_HEAD = """
+    <html>
+      <head>
+        <style>
+          body { font-family: sans-serif; }
+          table { border-collapse: collapse; width: 80%; }
+          th, td { border: 1px solid #dddddd; text-align: left; padding: 8px; }
+          th { background-color: #f2f2f2; }
+          ul { margin-top: 5px; }
+        </style>
+      </head>
+      <body>
+        <h2>Daily EUS Annotation Report</h2>
+        <h3>New Tasks Done Today</h3>
+        """
+EMAIL_BEFORE_CHANGED_TASKS = """
+        <br>
+        <h3>Updates to Existing Tasks</h3>
+        """
+EMAIL_BEFORE_ANNOTATION_FILES = """
+        <hr>
+        <br>
+        <p>"""
+EMAIL_BEFORE_CSV_PATH = """</p>
+        <br>
+        <p>Today's full CSV report is saved at: """
+EMAIL_TAIL = """</p>
+      </body>
+    </html>
+    """
+
+class RunStamp:
+    """
+    The date and time of a report run, taken once so every step of the run agrees on "today",
+    even when the run crosses midnight.
+    """
+    __slots__ = ('now', 'ymd', 'ymd_hm')
+
+    def __init__(self, now=None):
+        self.now = now or datetime.now()
+        self.ymd = self.now.strftime('%Y%m%d')
+        self.ymd_hm = self.now.strftime('%Y%m%d_%H%M')
 
-    last_working_day_folder = sorted(date_folders)[-1]
-    last_day_path = os.path.join(directory_path, last_working_day_folder)
+def get_last_working_day_df(directory_path, stamp=None):
+    import pandas as pd
 
-    # Find the relevant CSV file within that folder
-    last_csv_file = None
-    for file in os.listdir(last_day_path):
-        if '_annotation_stats_' in file and file.endswith('.csv'):
-            last_csv_file = file
-            break
+    today_str = (stamp or RunStamp()).ymd
+    # Find the last working day's CSV file ---
+    # Look it up in the archive index, and only rescan the date folders when the index is missing,
+    # points at a file that no longer exists, or is stale: a date folder newer than anything it
+    # knows about exists (e.g. its save failed, or another host wrote to a shared archive)
+    stats_index = load_stats_index(directory_path)
+    last_csv_path = None
+    if stats_index is not None and get_last_date_folder(directory_path, today_str) in stats_index:
+        last_csv_path = find_last_stats_csv(directory_path, stats_index, today_str)
+    if last_csv_path is None:
+        stats_index = build_stats_index(directory_path)
+        if stats_index:
+            save_stats_index(directory_path, stats_index)
+        last_csv_path = find_last_stats_csv(directory_path, stats_index, today_str)
 
-    if not last_csv_file:
-        logging.error(f"⚠️ No annotation stats CSV found in the last working day's folder: {last_day_path}")
+    if last_csv_path is None:
+        logging.error("💡 No previous working day's stats CSV found. Cannot perform comparison.")
         return None
 
-    last_csv_path = os.path.join(last_day_path, last_csv_file)
     logging.info(f" Last working day CSV path: {last_csv_path}")
     try:
-        last_working_day_df = pd.read_csv(last_csv_path)
+        # Prefer the Parquet copy of the CSV, it loads with its dtypes and without parsing
+        last_parquet_path = last_csv_path[:-len('.csv')] + '.parquet'
+        if os.path.isfile(last_parquet_path):
+            try:
+                return pd.read_parquet(last_parquet_path, columns=ANNOTATION_STATS_USECOLS)
+            except Exception as e:
+                logging.warning(f"⚠️ Could not read '{last_parquet_path}', reading the CSV instead: {e}")
+        last_working_day_df = read_csv(last_csv_path, ANNOTATION_STATS_DTYPES, ANNOTATION_STATS_USECOLS)
         return last_working_day_df
     except FileNotFoundError:
         logging.error(f"❌ Error: The directory '{directory_path}' was not found.")
@@ -45,7 +137,137 @@ def get_last_working_day_df(directory_path):
         logging.error(f"❌ An unexpected error occurred: {e}")
         return None
 
-def save_csv(proj_name, directory_path, final_stats_df):
+def get_last_date_folder(directory_path, today_str):
+    """Returns the name of the latest date folder from before today, or None if there is none."""
+    try:
+        # scandir entries carry the file type, so is_dir() needs no extra stat call,
+        # and the zero-padded YYYYMMDD names compare correctly as strings
+        with os.scandir(directory_path) as entries:
+            return max((e.name for e in entries
+                        if e.name.isdigit() and len(e.name) == 8 and e.name < today_str and e.is_dir()),
+                       default=None)
+    except OSError:
+        return None
+
+def find_last_stats_csv(directory_path, stats_index, today_str):
+    """Returns the path of the latest stats CSV in the index from before today, or None if there is none on disk."""
+    # Folders without a stats CSV are indexed as None, so they don't look new on the next run
+    last_working_day_folder = max((folder for folder, csv_name in stats_index.items()
+                                   if csv_name and folder < today_str), default=None)
+    if last_working_day_folder is None:
+        return None
+    last_csv_path = os.path.join(directory_path, last_working_day_folder, stats_index[last_working_day_folder])
+    return last_csv_path if os.path.isfile(last_csv_path) else None
+
+def load_stats_index(directory_path):
+    """
+    Loads the archive index, a dict of date folder -> name of the latest stats CSV in it
+    (None for date folders without one).
+
+    Returns:
+        The index, or None if it is missing or unreadable.
+    """
+    index_path = os.path.join(directory_path, '.index.json')
+    try:
+        with open(index_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"⚠️ Could not read the archive index '{index_path}': {e}")
+        return None
+
+def save_stats_index(directory_path, stats_index):
+    """Saves the archive index, replacing the previous one in a single rename."""
+    index_path = os.path.join(directory_path, '.index.json')
+    try:
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(stats_index, f, indent=0, sort_keys=True)
+        os.replace(index_path + '.tmp', index_path)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not save the archive index '{index_path}': {e}")
+
+def build_stats_index(directory_path):
+    """Rebuilds the archive index by scanning the date folders for their latest stats CSV."""
+    stats_index = {}
+    try:
+        # scandir entries carry the file type, so is_dir()/is_file() need no extra stat call
+        with os.scandir(directory_path) as entries:
+            date_folders = [e.name for e in entries if e.name.isdigit() and len(e.name) == 8 and e.is_dir()]
+        for date_folder in date_folders:
+            # The names end in a zero-padded timestamp, so the max name is the latest CSV of the day
+            with os.scandir(os.path.join(directory_path, date_folder)) as entries:
+                csv_name = max((e.name for e in entries
+                                if fnmatchcase(e.name, STATS_CSV_PATTERN) and e.is_file()), default=None)
+            stats_index[date_folder] = csv_name
+    except OSError as e:
+        logging.error(f"❌ Could not scan '{directory_path}' for previous stats: {e}")
+    return stats_index
+
+def read_csv(csv_path, dtypes=None, usecols=None):
+    """
+    Reads a CSV into a DataFrame with pyarrow's multi-threaded parser, falling back to pandas.
+
+    Args:
+        dtypes (dict): Column -> pandas dtype ('int64', 'Int64' or 'string'), to skip type inference.
+        usecols (list): The only columns to read. If None, all columns are read.
+    """
+    import pandas as pd
+
+    if dtypes is not None and usecols is not None:
+        dtypes = {column: dtypes[column] for column in usecols if column in dtypes}
+    pa, pacsv = import_pyarrow_csv()
+    if pacsv is not None:
+        # Empty fields become nulls, as they do with pd.read_csv
+        convert_options = pacsv.ConvertOptions(strings_can_be_null=True, include_columns=usecols)
+        if dtypes:
+            convert_options.column_types = {column: pa.string() if dtype == 'string' else pa.int64()
+                                            for column, dtype in dtypes.items()}
+        table = pacsv.read_csv(csv_path, read_options=pacsv.ReadOptions(use_threads=True),
+                               convert_options=convert_options)
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        # Arrow turns integer columns with nulls into floats, cast them back to the nullable dtypes
+        return df.astype(dtypes) if dtypes else df
+    return pd.read_csv(csv_path, dtype=dtypes, usecols=usecols, engine='c')
+
+CSV_WRITE_BUFFER_SIZE = 1 << 20
+
+def write_csv(df, csv_path):
+    """
+    Writes a DataFrame to CSV with pandas.
+
+    pandas is used rather than pyarrow's writer, which quotes every string field and header
+    and formats floats differently, so the archived CSVs keep the format other tools read.
+    The CSV is written to a temporary file and renamed into place, so a crash never
+    leaves a partial report for the next day's comparison.
+    """
+    tmp_path = f"{csv_path}.tmp"
+    try:
+        # A binary handle with a 1 MiB buffer cuts the number of write() calls
+        with open(tmp_path, 'wb', buffering=CSV_WRITE_BUFFER_SIZE) as f:
+            df.to_csv(f, index=False)
+        os.replace(tmp_path, csv_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_parquet(df, parquet_path):
+    """
+    Writes a Parquet copy of a stats DataFrame, for the next day's comparison to load.
+
+    The copy is optional, so failures (e.g. no Parquet engine installed) are only logged.
+    """
+    tmp_path = f"{parquet_path}.tmp"
+    try:
+        df.to_parquet(tmp_path, compression='snappy', index=False)
+        os.replace(tmp_path, parquet_path)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not save the Parquet copy '{parquet_path}': {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def save_csv(proj_name, directory_path, final_stats_df, stamp=None):
     """
     Saves a DataFrame to a CSV file inside a new, date-stamped folder.
 
@@ -53,18 +275,26 @@ def save_csv(proj_name, directory_path, final_stats_df):
         proj_name (str): The name of the project, used in the filename.
         directory_path (str): The parent directory where the new folder will be created.
         final_stats_df (pd.DataFrame): The DataFrame to save.
+        stamp (RunStamp): The run's timestamp. If None, the current time is used.
     """
-    now = datetime.now()
-    date_folder_str = now.strftime('%Y%m%d')
-    datetime_file_str = now.strftime('%Y%m%d_%H%M')
+    stamp = stamp or RunStamp()
+    date_folder_str = stamp.ymd
+    datetime_file_str = stamp.ymd_hm
 
     full_folder_path = os.path.join(directory_path, date_folder_str)
     filename = f"{proj_name}_annotation_stats_{datetime_file_str}.csv"
     try:
         os.makedirs(full_folder_path, exist_ok=True)
         full_file_path = os.path.join(full_folder_path, filename)
-        final_stats_df.to_csv(full_file_path, index=False)
+        write_csv(final_stats_df, full_file_path)
         logging.info(f"✅ Successfully saved stats to: {full_file_path}")
+        write_parquet(final_stats_df, full_file_path[:-len('.csv')] + '.parquet')
+        # Record the new CSV in the archive index, building the index first if there is none yet
+        stats_index = load_stats_index(directory_path)
+        if stats_index is None:
+            stats_index = build_stats_index(directory_path)
+        stats_index[date_folder_str] = filename
+        save_stats_index(directory_path, stats_index)
         return full_file_path
     except Exception as e:
         logging.warning(f"⚠️ Primary save location failed: {e}")
@@ -73,7 +303,7 @@ def save_csv(proj_name, directory_path, final_stats_df):
         fallback_file_path = os.path.join(home_dir, filename)
         try:
             # Attempt to save the file to the fallback location
-            final_stats_df.to_csv(fallback_file_path, index=False)
+            write_csv(final_stats_df, fallback_file_path)
             logging.info(f"⚠️ saved stats to fallback location: {fallback_file_path}")
             return fallback_file_path
         except Exception as e_fallback:
@@ -81,89 +311,389 @@ def save_csv(proj_name, directory_path, final_stats_df):
             logging.error("Could not save the file.")
             return None
 
-def send_email(config, new_tasks_df, changed_tasks_df, today_csv_path, today_annotation_filenames):
+def load_labels_cache_manifest(cache_dir):
+    """Loads the labels cache manifest, a dict of str(task_id) -> task updated_date."""
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"⚠️ Could not read the labels cache manifest '{manifest_path}': {e}")
+        return {}
+
+def save_labels_cache_manifest(cache_dir, manifest):
+    """Saves the labels cache manifest, replacing the previous one in a single rename."""
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not save the labels cache manifest '{manifest_path}': {e}")
+
+def prune_labels_cache(cache_dir, manifest, task_ids):
+    """
+    Drops the cached labels of tasks that are not in task_ids (deleted or skipped tasks):
+    their manifest entries, and their parquet files.
+    """
+    keep = {str(task_id) for task_id in task_ids}
+    for key in [key for key in manifest if key not in keep]:
+        del manifest[key]
+    try:
+        with os.scandir(cache_dir) as entries:
+            stale_files = [e.path for e in entries
+                           if e.name.endswith('.parquet') and e.name[:-len('.parquet')] not in keep]
+    except FileNotFoundError:
+        return
+    for path in stale_files:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.warning(f"⚠️ Could not remove the stale labels cache file '{path}': {e}")
+
+def read_cached_labels(cache_dir, task_id):
+    """
+    Reads the cached shapes of a task.
+
+    Returns:
+        A NumPy int64 array of (frame, label_id) rows, or None if the task is not cached.
+    """
+    import pandas as pd
+
+    try:
+        labels_df = pd.read_parquet(os.path.join(cache_dir, f'{task_id}.parquet'), columns=['frame', 'label_id'])
+        return labels_df.to_numpy(dtype='int64')
+    except Exception:
+        return None  # Also covers caches from older versions, which stored label names
+
+def write_cached_labels(cache_dir, task_id, frame_label_ids):
+    """
+    Writes the shapes of a task to '{cache_dir}/{task_id}.parquet', one (frame, label_id) row per shape.
+
+    Label ids are cached rather than names, so renamed labels are picked up on the next read.
+
+    Returns:
+        True if the labels were cached, False otherwise.
+    """
+    import pandas as pd
+
+    labels_df = pd.DataFrame(frame_label_ids.reshape(-1, 2), columns=['frame', 'label_id'])
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        labels_df.to_parquet(os.path.join(cache_dir, f'{task_id}.parquet'), index=False)
+        return True
+    except Exception as e:
+        logging.warning(f"⚠️ Could not cache the labels of Task ID {task_id}: {e}")
+        return False
+
+def df_to_html(df, buf):
+    """
+    Writes a DataFrame as an HTML table into a text buffer, without going through pandas' HTML formatter.
+
+    Every cell is HTML-escaped, and missing values are rendered as empty cells.
+    """
+    import pandas as pd
+
+    buf.write('<table border="1" class="dataframe"><thead><tr>')
+    buf.write(''.join(f"<th>{escape(str(column))}</th>" for column in df.columns))
+    buf.write('</tr></thead><tbody>')
+    for row in df.to_numpy(dtype=object):
+        buf.write("<tr>" + ''.join(f"<td>{'' if pd.isna(value) else escape(str(value))}</td>" for value in row) + "</tr>")
+    buf.write('</tbody></table>')
+
+def preview_to_html(df, buf, attachment_name):
+    """
+    Writes the first EMAIL_PREVIEW_ROWS rows of a DataFrame as HTML into buf, noting how many rows
+    were left out and the name of the attachment that holds all of them.
+    """
+    if len(df) <= EMAIL_PREVIEW_ROWS:
+        df_to_html(df, buf)
+        return
+    df_to_html(df.head(EMAIL_PREVIEW_ROWS), buf)
+    buf.write(f"<p>Showing the first {EMAIL_PREVIEW_ROWS} of {len(df)} rows, "
+              f"see the attached {escape(attachment_name)} for all of them.</p>")
+
+def write_tasks_section(buf, df, empty_html, attachment_name):
+    """Writes a preview of the tasks into buf, or empty_html when there are none."""
+    if df.empty:
+        buf.write(empty_html)
+    else:
+        preview_to_html(df, buf, attachment_name)
+
+def gzip_attachment(data, filename):
+    """Gzips bytes into an 'application/gzip' email attachment named '<filename>.gz'."""
+    import gzip
+    from email import encoders
+    from email.mime.base import MIMEBase
+
+    part = MIMEBase('application', 'gzip')
+    part.set_payload(gzip.compress(data, compresslevel=6))
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', 'attachment', filename=f"{filename}.gz")
+    return part
+
+def file_gzip_attachment(file_path):
+    """
+    Gzips a file into an email attachment.
+
+    Returns:
+        MIMEBase: The attachment, or None if the file could not be read.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except (OSError, TypeError) as e:
+        logging.warning(f"⚠️ Could not attach '{file_path}' to the email: {e}")
+        return None
+    return gzip_attachment(data, os.path.basename(file_path))
+
+def df_gzip_attachment(df, filename):
+    """Gzips a DataFrame, as CSV, into an email attachment."""
+    return gzip_attachment(df.to_csv(index=False).encode('utf-8'), filename)
+
+class SmtpSession:
+    """
+    An authenticated SMTP connection that can send several messages.
+
+    Connects, starts TLS and logs in on enter, and quits on exit:
+
+        with SmtpSession(config['email_params']) as session:
+            send_email(config, ..., session=session)
+    """
+
+    def __init__(self, email_params):
+        self.email_params = email_params
+        self.server = None
+
+    def open(self):
+        import smtplib
+
+        self.server = smtplib.SMTP(self.email_params['smtp_server'], self.email_params['port'])
+        try:
+            self.server.starttls()
+            self.server.login(self.email_params['username'], self.email_params['password'])
+        except Exception:
+            self.server.close()
+            raise
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def send(self, msg, recipients):
+        import smtplib
+
+        try:
+            self.server.sendmail(self.email_params['sender'], recipients, msg.as_string())
+        finally:
+            # Reset the mail transaction so the connection is clean for the next message
+            try:
+                self.server.rset()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+    def close(self):
+        import smtplib
+
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def get_recipients(email_params):
+    """
+    Returns the (to, cc) address lists of the report, with blank and duplicate addresses removed.
+
+    Addresses are compared case-insensitively, and a CC address that is also the destination
+    is dropped, so each recipient costs a single RCPT TO.
+    """
+    seen = set()
+    groups = []
+    for addrs in (email_params['destination'], email_params.get('cc') or []):
+        group = []
+        for addr in ([addrs] if isinstance(addrs, str) else addrs):
+            addr = addr.strip()
+            if addr and addr.lower() not in seen:
+                seen.add(addr.lower())
+                group.append(addr)
+        groups.append(group)
+    return groups[0], groups[1]
+
+def build_email_message(config, new_tasks_df, changed_tasks_df, today_csv_path, today_annotation_filenames, today_str):
+    """
+    Builds the daily report email: the HTML summary, with the new tasks, the changed tasks
+    and today's full stats CSV attached as gzipped CSVs.
+    """
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     email_params = config['email_params']
     annotations_dir = config['annotations_dir']   #.split('=')[-1]
-    today_str = datetime.now().strftime('%Y%m%d')
 
     num_new = len(new_tasks_df) + len(changed_tasks_df)
 
-    # Convert DataFrames to HTML, adding a message for empty frames
-    if new_tasks_df.empty:
-        new_tasks_html = "<p>No new tasks were added today.</p>"
-    else:
-        new_tasks_html = new_tasks_df.to_html(index=False)
-
-    if changed_tasks_df.empty:
-        changed_tasks_html = "<p>No changes were detected in existing tasks.</p>"
-    else:
-        changed_tasks_html = changed_tasks_df.to_html(index=False)
+    # The new and changed tasks are attached in full, the email body only previews them
+    new_tasks_csv_name = f"new_tasks_{today_str}.csv"
+    changed_tasks_csv_name = f"changed_tasks_{today_str}.csv"
 
     # Generate the HTML for the list of annotation files
     if today_annotation_filenames:
-        # Create an HTML list item <li> for each filename
-        file_list_html = ''.join([f"<li>{f}</li>" for f in today_annotation_filenames])
+        # Create an escaped HTML list item <li> for each filename, in one pass with no intermediate list
+        file_list_html = ''.join(map('<li>{}</li>'.format, map(escape, today_annotation_filenames)))
 
         # Assemble the full HTML section with a heading and the bulleted list
-        annotation_files_section_html = f"""
-        <h3>{num_new} New annotation files downloaded :</h3>
-        <p> at: {annotations_dir}/{today_str} </p>
-        <ul>
-            {file_list_html}
-        </ul>
-        """
+        annotation_files_section_html = ANNOTATION_FILES_TEMPLATE.substitute(
+            num_new=num_new, annotations_dir=annotations_dir, today_str=today_str, file_list_html=file_list_html)
     else:
         annotation_files_section_html = "<p>No new annotation files were downloaded today.</p>"
 
-    content = f"""
-    <html>
-      <head>
-        <style>
-          body {{ font-family: sans-serif; }}
-          table {{ border-collapse: collapse; width: 80%; }}
-          th, td {{ border: 1px solid #dddddd; text-align: left; padding: 8px; }}
-          th {{ background-color: #f2f2f2; }}
-          ul {{ margin-top: 5px; }}
-        </style>
-      </head>
-      <body>
-        <h2>Daily EUS Annotation Report</h2>
-        <h3>New Tasks Done Today</h3>
-        {new_tasks_html}
-        <br>
-        <h3>Updates to Existing Tasks</h3>
-        {changed_tasks_html}
-        <hr>
-        <br>
-        <p>{annotation_files_section_html}</p>
-        <br>
-        <p>Today's full CSV report is saved at: {today_csv_path}</p>
-      </body>
-    </html>
-    """
+    # The body is written into a single buffer, section by section, so the tables are never built
+    # as separate strings. The DataFrames get a message instead when they are empty.
+    content = io.StringIO()
+    content.write(EMAIL_HEAD)
+    write_tasks_section(content, new_tasks_df, "<p>No new tasks were added today.</p>", new_tasks_csv_name + '.gz')
+    content.write(EMAIL_BEFORE_CHANGED_TASKS)
+    write_tasks_section(content, changed_tasks_df, "<p>No changes were detected in existing tasks.</p>",
+                        changed_tasks_csv_name + '.gz')
+    content.write(EMAIL_BEFORE_ANNOTATION_FILES)
+    content.write(annotation_files_section_html)
+    content.write(EMAIL_BEFORE_CSV_PATH)
+    content.write(str(today_csv_path))
+    content.write(EMAIL_TAIL)
+
     subject = f"EUS annotation report for {today_str}"
 
     msg = MIMEMultipart()
     msg['Subject'] = subject
     msg['From'] = email_params['sender']
-    msg['To'] = email_params['destination']
-    msg['CC'] = ', '.join(email_params['cc'])
-    msg.attach(MIMEText(content, 'html'))
-    recipients = [email_params['destination']] + email_params['cc']
-    try:
-        with smtplib.SMTP(email_params['smtp_server'], email_params['port']) as server:
-            server.starttls()
-            server.login(email_params['username'], email_params['password'])
-            server.sendmail(email_params['sender'], recipients, msg.as_string())
-            logging.info(f'Email sent to {recipients}')
+    to_addrs, cc_addrs = get_recipients(email_params)
+    msg['To'] = ', '.join(to_addrs)
+    if cc_addrs:
+        msg['CC'] = ', '.join(cc_addrs)
+    msg.attach(MIMEText(content.getvalue(), 'html'))
+    if not new_tasks_df.empty:
+        msg.attach(df_gzip_attachment(new_tasks_df, new_tasks_csv_name))
+    if not changed_tasks_df.empty:
+        msg.attach(df_gzip_attachment(changed_tasks_df, changed_tasks_csv_name))
+    csv_attachment = file_gzip_attachment(today_csv_path)
+    if csv_attachment is not None:
+        msg.attach(csv_attachment)
+    return msg
+
+def prepare_email(config, new_tasks_df, changed_tasks_df, today_csv_path, today_annotation_filenames, stamp=None,
+                  connect=True):
+    """
+    Builds the report email, opening the SMTP connection in the background meanwhile when connect is True,
+    so the connect, TLS and login round trips overlap with the HTML formatting.
+
+    Returns:
+        A (connect_future, msg, recipients, today_str) email job. connect_future is None when connect is False.
+    """
+    email_params = config['email_params']
+    today_str = (stamp or RunStamp()).ymd
+
+    connect_future = None
+    if connect:
+        connect_executor = ThreadPoolExecutor(max_workers=1)
+        connect_future = connect_executor.submit(SmtpSession(email_params).open)
+        connect_executor.shutdown(wait=False)
+
+    try:
+        msg = build_email_message(config, new_tasks_df, changed_tasks_df, today_csv_path,
+                                  today_annotation_filenames, today_str)
+    except Exception:
+        # Don't leave the background connection open when the message can't be built
+        if connect_future is not None and connect_future.exception() is None:
+            connect_future.result().close()
+        raise
+
+    to_addrs, cc_addrs = get_recipients(email_params)
+    return connect_future, msg, to_addrs + cc_addrs, today_str
+
+def send_email_job(connect_future, msg, recipients, today_str):
+    """Sends a prepared email over its own connection, then closes it. Errors are logged."""
+    try:
+        smtp_session = connect_future.result()
+        try:
+            smtp_session.send(msg, recipients)
+        finally:
+            smtp_session.close()
+        logging.info(f'Email sent to {recipients}')
+    except Exception as e:
+        logging.error(f"Could not send email for {today_str}: {e}")
+
+def send_email(config, new_tasks_df, changed_tasks_df, today_csv_path, today_annotation_filenames, session=None,
+               stamp=None):
+    """
+    Sends the daily report email, returning once it has been sent (or the failure has been logged).
+
+    Args:
+        session (SmtpSession): An open session to send through, so several reports can share
+            one connection. If None, a connection is opened for this email only.
+        stamp (RunStamp): The run's timestamp. If None, the current time is used.
+    """
+    connect_future, msg, recipients, today_str = prepare_email(
+        config, new_tasks_df, changed_tasks_df, today_csv_path, today_annotation_filenames, stamp,
+        connect=session is None)
+    if session is None:
+        send_email_job(connect_future, msg, recipients, today_str)
+        return
+    try:
+        session.send(msg, recipients)
+        logging.info(f'Email sent to {recipients}')
     except Exception as e:
         logging.error(f"Could not send email for {today_str}: {e}")
 
+def save_config_cache(config_path, cache_path, config):
+    """Saves the parsed config as JSON, with the same permissions as the YAML file it came from."""
+    try:
+        content = json.dumps(config)
+        with open(cache_path + '.tmp', 'w') as f:
+            f.write(content)
+        shutil.copymode(config_path, cache_path + '.tmp')
+        os.replace(cache_path + '.tmp', cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        logging.warning(f"⚠️ Could not cache the configuration to '{cache_path}': {e}")
+
+@lru_cache(maxsize=None)
 def load_config(config_path='config.yaml'):
-    """Loads the configuration from a YAML file."""
+    """
+    Loads the configuration from a YAML file.
+
+    A JSON config next to it with the same name (e.g. 'config.json', see config_to_json.py)
+    takes precedence, and needs no YAML parser at all, unless the YAML file is newer. Otherwise the parsed YAML is cached to
+    '<config_path>.cache.json', which is reused while it is at least as new as the YAML file.
+    """
+    json_path = os.path.splitext(config_path)[0] + '.json'
+    cache_path = config_path + '.cache.json'
     try:
+        if os.path.exists(json_path):
+            if json_path != config_path and os.path.exists(config_path) \
+                    and os.path.getmtime(config_path) > os.path.getmtime(json_path):
+                logging.warning(f"⚠️ '{config_path}' was modified after '{json_path}', using '{config_path}'. "
+                                f"Rerun config_to_json.py to update '{json_path}'.")
+            else:
+                with open(json_path, 'rb') as f:
+                    return json.load(f)
+        config_mtime = os.path.getmtime(config_path)
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= config_mtime:
+            try:
+                with open(cache_path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass  # Unreadable cache, parse the YAML file again
+        # yaml is only imported on a cache miss, the libyaml-based loader is much faster when PyYAML was built with it
+        import yaml
         with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
+            config = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        save_config_cache(config_path, cache_path, config)
+        return config
     except FileNotFoundError:
         logging.error(f"Error: Configuration file not found at '{config_path}'")
         exit()
@@ -171,3 +701,4 @@ def load_config(config_path='config.yaml'):
         logging.error(f"Error loading configuration: {e}")
         exit()
 
+